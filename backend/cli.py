@@ -18,11 +18,6 @@ import os
 # Load environment variables
 load_dotenv()
 
-# Import backend modules
-from crawler import WebCrawler
-from vector_store import VectorStore
-from rag_chat import RAGChatService
-
 logger = logging.getLogger(__name__)
 
 app = typer.Typer(help="TalkDocs2 CLI - Documentation Chatbot", add_completion=False)
@@ -37,6 +32,11 @@ def initialize_services():
     """Initialize backend services"""
     global vector_store, crawler, rag_chat
     if vector_store is None:
+        # Import backend modules lazily so --help does not pay for chromadb/torch imports
+        from crawler import WebCrawler
+        from vector_store import VectorStore
+        from rag_chat import RAGChatService
+        
         vector_store = VectorStore()
         crawler = WebCrawler(
             vector_store=vector_store,
@@ -412,36 +412,14 @@ def show_menu():
 
 async def handle_menu_choice(choice: int):
     """Handle menu choice"""
-    if choice == 1:
-        # Interactive chat
-        await do_interactive_chat()
-    elif choice == 2:
-        # Single query chat
-        query = Prompt.ask("\n[bold green]Enter your question[/bold green]")
-        if query:
-            await do_single_chat(query)
-    elif choice == 3:
-        # Crawl website
-        await do_interactive_crawl()
-    elif choice == 4:
-        # Manage sources
-        await do_manage_sources()
-    elif choice == 5:
-        # Search documents
-        await do_interactive_search()
-    elif choice == 6:
-        # Manage provider
-        await do_manage_provider()
-    elif choice == 7:
-        # View stats
-        await do_show_stats()
-    elif choice == 8:
-        # Clear database
-        await do_clear_database()
-    elif choice == 9:
+    if choice == 9:
         # Exit
         console.print("\n[bold yellow]Goodbye![/bold yellow]")
         return False
+    
+    action = MENU_ACTIONS.get(choice)
+    if action:
+        await action()
     else:
         console.print("[bold red]Invalid choice. Please try again.[/bold red]")
     
@@ -778,6 +756,24 @@ async def do_clear_database():
     
     Prompt.ask("\n[dim]Press Enter to continue...[/dim]", default="")
 
+async def do_prompt_single_chat():
+    """Ask for a question and answer it once"""
+    query = Prompt.ask("\n[bold green]Enter your question[/bold green]")
+    if query:
+        await do_single_chat(query)
+
+# Main menu number -> handler (9 exits and is handled in handle_menu_choice)
+MENU_ACTIONS = {
+    1: do_interactive_chat,
+    2: do_prompt_single_chat,
+    3: do_interactive_crawl,
+    4: do_manage_sources,
+    5: do_interactive_search,
+    6: do_manage_provider,
+    7: do_show_stats,
+    8: do_clear_database,
+}
+
 async def interactive_mode():
     """Main interactive mode"""
     console.print(Panel.fit(
@@ -15,6 +15,32 @@ import hashlib
 
 logger = logging.getLogger(__name__)
 
+# Query parameters that don't affect page content (ignored when normalizing URLs)
+TRACKING_PARAMS = frozenset({
+    'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content',
+    'ref', 'source', 'fbclid', 'gclid', '_ga', '_gl'
+})
+
+# Common non-content URLs, combined into a single pattern so each URL is scanned once
+SKIP_URL_RE = re.compile(
+    r'\.(pdf|doc|docx|xls|xlsx|ppt|pptx|zip|rar|tar|gz)$'
+    r'|\.(jpg|jpeg|png|gif|svg|ico|webp)$'
+    r'|\.(css|js|json|xml)$'
+    r'|#'  # Fragment identifiers
+    r'|mailto:'  # Email links
+    r'|tel:',  # Phone links
+    re.IGNORECASE
+)
+# Patterns used while normalizing URLs and extracting page text
+WHITESPACE_RE = re.compile(r'\s+')
+MULTI_SLASH_RE = re.compile(r'/+')
+CONTENT_CLASS_RE = re.compile(r'content|main|body', re.I)
+
+def compute_content_hash(content: str) -> str:
+    """Hash page content for duplicate detection, ignoring case and whitespace differences"""
+    normalized = ' '.join(content.lower().split())
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+
 class WebCrawler:
     def __init__(
         self,
@@ -23,6 +49,7 @@ class WebCrawler:
         max_retries: int = 3,
         backoff_factor: float = 1.5,
         persistence_workers: int = 3,
+        persistence_batch_size: int = 16,
         max_concurrent_requests: int = 10,
         parse_workers: int = 4,
         user_agent: str = (
@@ -39,6 +66,7 @@ class WebCrawler:
         self.max_retries = max_retries
         self.backoff_factor = backoff_factor
         self.persistence_workers = max(1, persistence_workers)
+        self.persistence_batch_size = max(1, persistence_batch_size)
         self.max_concurrent_requests = max(1, max_concurrent_requests)
         self.parse_workers = max(1, parse_workers)
         self.user_agent = user_agent
@@ -96,7 +124,7 @@ class WebCrawler:
             if path != '/' and path.endswith('/'):
                 path = path[:-1]
             # Normalize multiple slashes
-            path = re.sub(r'/+', '/', path) or '/'
+            path = MULTI_SLASH_RE.sub('/', path) or '/'
             # Decode URL encoding for better comparison
             try:
                 from urllib.parse import unquote
@@ -112,10 +140,8 @@ class WebCrawler:
                 query_pairs = parse_qsl(parsed_url.query, keep_blank_values=True)
                 # Remove common tracking parameters that don't affect content
                 filtered_pairs = []
-                skip_params = {'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content',
-                              'ref', 'source', 'fbclid', 'gclid', '_ga', '_gl'}
                 for key, value in query_pairs:
-                    if key.lower() not in skip_params:
+                    if key.lower() not in TRACKING_PARAMS:
                         filtered_pairs.append((key.lower(), value))
                 query = urlencode(sorted(filtered_pairs)) if filtered_pairs else ''
             else:
@@ -145,18 +171,8 @@ class WebCrawler:
                 return False
             
             # Skip common non-content URLs
-            skip_patterns = [
-                r'\.(pdf|doc|docx|xls|xlsx|ppt|pptx|zip|rar|tar|gz)$',
-                r'\.(jpg|jpeg|png|gif|svg|ico|webp)$',
-                r'\.(css|js|json|xml)$',
-                r'#',  # Fragment identifiers
-                r'mailto:',  # Email links
-                r'tel:',  # Phone links
-            ]
-            
-            for pattern in skip_patterns:
-                if re.search(pattern, url, re.IGNORECASE):
-                    return False
+            if SKIP_URL_RE.search(url):
+                return False
             
             return True
         except Exception:
@@ -234,16 +250,9 @@ class WebCrawler:
             logger.debug(f"Failed to extract canonical URL: {str(e)}")
         return None
     
-    def _compute_content_hash(self, content: str) -> str:
-        """Compute hash of content for duplicate detection"""
-        # Normalize content: lowercase, remove extra whitespace
-        normalized = re.sub(r'\s+', ' ', content.lower().strip())
-        # Compute hash
-        return hashlib.md5(normalized.encode('utf-8')).hexdigest()
-    
     def _is_duplicate_content(self, content: str) -> bool:
         """Check if content hash has been seen before"""
-        content_hash = self._compute_content_hash(content)
+        content_hash = compute_content_hash(content)
         if content_hash in self._content_hashes:
             return True
         self._content_hashes.add(content_hash)
@@ -265,7 +274,7 @@ class WebCrawler:
         content = ""
         
         # Try to find main content area
-        main_content = soup.find('main') or soup.find('article') or soup.find('div', class_=re.compile(r'content|main|body', re.I))
+        main_content = soup.find('main') or soup.find('article') or soup.find('div', class_=CONTENT_CLASS_RE)
         
         if main_content:
             content = main_content.get_text(separator=' ', strip=True)
@@ -276,7 +285,7 @@ class WebCrawler:
                 content = body.get_text(separator=' ', strip=True)
         
         # Clean up content
-        content = re.sub(r'\s+', ' ', content)  # Replace multiple whitespace with single space
+        content = WHITESPACE_RE.sub(' ', content)  # Replace multiple whitespace with single space
         content = content.strip()
         
         # Extract meta description
@@ -389,25 +398,43 @@ class WebCrawler:
         return None
     
     async def _persistence_worker(self, queue: asyncio.Queue, new_pages: List[Dict], source_url: str):
-        """Persist fetched pages asynchronously"""
-        while True:
-            page = await queue.get()
-            if page is None:
-                queue.task_done()
-                break
-            
-            if not self.vector_store:
-                new_pages.append(page)
-                queue.task_done()
-                continue
+        """Persist fetched pages asynchronously, storing whatever is queued as one batch"""
+        done = False
+        while not done:
+            batch = [await queue.get()]
+            # Drain pages that are already waiting so they share one embedding call and write;
+            # stop at the first sentinel so every worker still receives its own
+            while batch[-1] is not None and len(batch) < self.persistence_batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            
+            done = batch[-1] is None
+            pages = batch[:-1] if done else batch
             
             try:
-                await self.vector_store.store_documents([page], source_url=source_url)
-                new_pages.append(page)
+                if pages and self.vector_store:
+                    await self._store_pages(pages, new_pages, source_url)
+                else:
+                    new_pages.extend(pages)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+    
+    async def _store_pages(self, pages: List[Dict], new_pages: List[Dict], source_url: str):
+        """Store a batch of pages, falling back to one page at a time if the batch fails"""
+        try:
+            new_pages.extend(await self.vector_store.store_documents(pages, source_url=source_url))
+            return
+        except Exception as e:
+            if len(pages) == 1:
+                logger.error(f"Failed to persist page {pages[0].get('url')}: {str(e)}")
+                return
+            logger.warning(f"Failed to persist batch of {len(pages)} pages, retrying individually: {str(e)}")
+        
+        for page in pages:
+            try:
+                new_pages.extend(await self.vector_store.store_documents([page], source_url=source_url))
             except Exception as e:
                 logger.error(f"Failed to persist page {page.get('url')}: {str(e)}")
-            finally:
-                queue.task_done()
     
     async def crawl_domain(self, start_url: str, max_depth: int = 3, max_pages: int = 1000, delay: float = 0.3) -> Dict:
         """
@@ -427,7 +454,7 @@ class WebCrawler:
             logger.info(f"Starting DFS crawl from {start_url}")
             logger.info(f"Max depth: {max_depth}, Max pages: {max_pages}, Delay: {delay}s")
             
-            with tqdm(total=max_pages, desc="Crawling pages") as pbar:
+            with tqdm(total=max_pages, desc="Crawling pages", mininterval=0.5) as pbar:
                 while url_queue and pages_collected < max_pages:
                     current_url, depth = url_queue.pop()  # DFS: LIFO
                     
@@ -446,11 +473,12 @@ class WebCrawler:
                     if page_data:
                         pages.append(page_data)
                         pages_collected += 1
-                        pbar.update(1)
+                        # Postfix is drawn by the rate-limited update() instead of forcing a redraw
                         pbar.set_postfix({
                             'current': current_url[:50] + '...' if len(current_url) > 50 else current_url,
                             'depth': depth
-                        })
+                        }, refresh=False)
+                        pbar.update(1)
                         
                         # Add new links to queue (DFS: add to front)
                         if depth < max_depth:
@@ -546,7 +574,7 @@ class WebCrawler:
                 page_data = await self._fetch_page(url)
                 return (page_data, url, depth) if page_data else None
             
-            with tqdm(total=max_pages, desc="Crawling pages") as pbar:
+            with tqdm(total=max_pages, desc="Crawling pages", mininterval=0.5) as pbar:
                 while url_queue and new_pages_count < max_pages:
                     # Process multiple URLs concurrently
                     batch_size = min(self.max_concurrent_requests, max_pages - new_pages_count)
@@ -578,14 +606,15 @@ class WebCrawler:
                                 new_pages.append(page_data)
                             
                             new_pages_count += 1
-                            pbar.update(1)
+                            # Postfix is drawn by the rate-limited update() instead of forcing a redraw
                             pbar.set_postfix({
                                 'current': url[:50] + '...' if len(url) > 50 else url,
                                 'depth': depth,
                                 'new': new_pages_count,
                                 'existing': len(existing_documents),
                                 'concurrent': len(batch)
-                            })
+                            }, refresh=False)
+                            pbar.update(1)
                             
                             # Add new links to queue (DFS)
                             if depth < max_depth:
@@ -1,5 +1,6 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import uvicorn
@@ -93,6 +94,10 @@ async def startup_event():
         await vector_store.initialize()
         rag_chat = RAGChatService(vector_store)
         logger.info("RAG Chat Service initialized successfully")
+        
+        # Warm up models now rather than on the first user request
+        await vector_store.warmup()
+        await asyncio.get_event_loop().run_in_executor(None, rag_chat.warmup)
     except Exception as e:
         logger.error(f"Failed to initialize RAG Chat Service: {str(e)}")
 
@@ -337,6 +342,30 @@ async def chat_with_rag(request: ChatRequest):
         logger.error(f"Chat request failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Chat request failed: {str(e)}")
 
+@app.post("/chat/stream")
+async def chat_with_rag_stream(request: ChatRequest):
+    """
+    Chat with the RAG-powered AI assistant, streaming the response as plain text
+    """
+    if not rag_chat:
+        raise HTTPException(status_code=503, detail="RAG Chat Service not initialized")
+    
+    logger.info(f"Processing streaming chat request: {request.message[:100]}...")
+    
+    conversation_history = [
+        {'role': msg.role, 'content': msg.content}
+        for msg in (request.conversation_history or [])
+    ]
+    
+    return StreamingResponse(
+        rag_chat.generate_response_stream(
+            user_message=request.message,
+            conversation_history=conversation_history,
+            max_context_docs=10
+        ),
+        media_type="text/plain"
+    )
+
 @app.get("/chat/stats")
 async def get_chat_stats():
     """
@@ -1,9 +1,15 @@
 import openai
 import logging
-from typing import List, Dict, Any, Optional, Literal
+import numpy as np
+from typing import List, Dict, Any, Optional, Literal, Iterator, AsyncIterator, Tuple
 from vector_store import VectorStore
 import os
 import re
+import hashlib
+import asyncio
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 import warnings
 from contextlib import redirect_stderr
 from io import StringIO
@@ -12,7 +18,7 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-# Suppress Google Generative AI warnings before importing
+# Suppress Google Generative AI warnings before it is imported (lazily, in _initialize_gemini)
 os.environ['GRPC_VERBOSITY'] = 'ERROR'
 os.environ['GLOG_minloglevel'] = '2'
 os.environ['ABSL_MIN_LOG_LEVEL'] = '2'
@@ -24,14 +30,48 @@ os.environ['TOKENIZERS_PARALLELISM'] = 'false'
 # Suppress warnings
 warnings.filterwarnings('ignore')
 
-# Import google.generativeai
-import google.generativeai as genai
-
 logger = logging.getLogger(__name__)
 
 # Supported model providers
 ModelProvider = Literal['lm_studio', 'gemini']
 
+# Word tokenizer used by rule-based reranking
+WORD_RE = re.compile(r'\b\w+\b')
+
+# Common stop words ignored by rule-based reranking
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
+    'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did',
+    'will', 'would', 'should', 'could', 'may', 'might', 'can', 'this', 'that', 'these', 'those',
+    'what', 'which', 'who', 'whom', 'how', 'when', 'where', 'why'
+})
+
+# System prompt with instructions for the AI assistant
+SYSTEM_PROMPT = """You are a helpful AI assistant that answers questions based on the provided documentation context and conversation history. 
+
+Instructions:
+1. Answer the user's question using the information provided in the context and previous conversation
+2. Reference previous conversation when relevant to provide continuity and context
+3. If the context doesn't contain enough information to answer the question, say so clearly
+4. Be concise but comprehensive in your responses
+5. Cite specific documents or sections when relevant
+6. Maintain a helpful and professional tone
+7. If asked about something not in the context, politely explain that you can only answer based on the available documentation
+8. Build upon previous questions and answers to provide more detailed or related information when appropriate
+
+FORMATTING GUIDELINES:
+- Use proper markdown formatting for better readability
+- Use **bold** for important concepts and key terms
+- Use *italics* for emphasis
+- Use `code blocks` for code snippets, commands, and technical terms
+- Use ```language blocks for multi-line code examples
+- Use > blockquotes for important notes or warnings
+- Use bullet points (- or *) for lists
+- Use numbered lists (1., 2., 3.) for step-by-step instructions
+- Use ### for section headers when organizing complex information
+- Use tables when presenting structured data
+- Always format URLs as clickable links: [text](url)"""
+
 # Try to import cross-encoder for neural reranking
 try:
     from sentence_transformers import CrossEncoder
@@ -40,6 +80,11 @@ except ImportError:
     CROSS_ENCODER_AVAILABLE = False
     logger.warning("sentence-transformers not available. Falling back to rule-based reranking.")
 
+@lru_cache(maxsize=2)
+def _get_cross_encoder(model_name: str) -> "CrossEncoder":
+    """Load a reranker model once per process and share it across RAGChatService instances"""
+    return CrossEncoder(model_name, max_length=512)
+
 class RAGChatService:
     def __init__(self, vector_store: VectorStore):
         self.vector_store = vector_store
@@ -61,6 +106,11 @@ class RAGChatService:
         self.max_context_chars = int(os.getenv('MAX_CONTEXT_CHARS', '12000'))  # Max characters in document context
         self.max_doc_chars = int(os.getenv('MAX_DOC_CHARS', '2000'))  # Max chars per document (already used)
         
+        # LRU cache of generated responses keyed by the exact prompt sent to the model
+        self.response_cache_size = int(os.getenv('RESPONSE_CACHE_SIZE', '256'))
+        self._response_cache: OrderedDict = OrderedDict()
+        self._response_cache_lock = threading.Lock()
+        
         self._initialize_provider()
         self._initialize_reranker()
     
@@ -120,6 +170,9 @@ class RAGChatService:
                 logger.error("GEMINI_API_KEY not found in environment variables")
                 raise ValueError("GEMINI_API_KEY is required for Gemini provider")
             
+            # Imported here so the LM Studio provider never pays for the gRPC/protobuf stack
+            import google.generativeai as genai
+            
             # Configure the client with stderr suppression
             with redirect_stderr(StringIO()):
                 genai.configure(api_key=api_key)
@@ -179,13 +232,22 @@ class RAGChatService:
             # Use a lightweight but effective cross-encoder model for reranking
             reranker_model = os.getenv('RERANKER_MODEL', 'cross-encoder/ms-marco-MiniLM-L-6-v2')
             logger.info(f"Initializing neural reranker with model: {reranker_model}")
-            self.cross_encoder = CrossEncoder(reranker_model, max_length=512)
+            self.cross_encoder = _get_cross_encoder(reranker_model)
             logger.info("Neural reranker initialized successfully")
         except Exception as e:
             logger.warning(f"Failed to initialize neural reranker: {str(e)}. Falling back to rule-based reranking.")
             self.cross_encoder = None
             self.use_neural_reranker = False
     
+    def warmup(self):
+        """Score one throwaway pair so the first real rerank skips lazy model initialization"""
+        if not (self.cross_encoder and self.use_neural_reranker):
+            return
+        try:
+            self.cross_encoder.predict([("warmup", "warmup")])
+        except Exception as e:
+            logger.warning(f"Neural reranker warm-up failed: {str(e)}")
+    
     def _rerank_documents(self, documents: List[Dict[str, Any]], query: str, top_k: int = 10) -> List[Dict[str, Any]]:
         """
         Re-rank documents using neural cross-encoder model (if available) or rule-based scoring
@@ -234,20 +296,17 @@ class RAGChatService:
                 pairs.append([query, doc_text])
             
             # Get scores from cross-encoder (batch prediction for efficiency)
-            scores = self.cross_encoder.predict(pairs)
+            scores = np.atleast_1d(np.asarray(self.cross_encoder.predict(pairs), dtype=np.float32))
             
-            # Handle both single score and array of scores
-            if not isinstance(scores, (list, tuple)):
-                scores = [scores] if len(documents) == 1 else scores.tolist()
+            # Select top_k documents with a partial sort, then order just those
+            k = min(top_k, len(documents))
+            if k <= 0:
+                return []
+            top_indices = np.argpartition(-scores, k - 1)[:k]
+            top_indices = top_indices[np.argsort(-scores[top_indices], kind='stable')]
+            reranked = [documents[i] for i in top_indices]
             
-            # Combine scores with documents and sort
-            scored_docs = list(zip(scores, documents))
-            scored_docs.sort(key=lambda x: x[0], reverse=True)
-            
-            # Select top_k documents
-            reranked = [doc for _, doc in scored_docs[:top_k]]
-            
-            logger.info(f"Neural re-ranked {len(documents)} documents, selected top {len(reranked)} with scores: {[f'{s:.3f}' for s, _ in scored_docs[:top_k]]}")
+            logger.info(f"Neural re-ranked {len(documents)} documents, selected top {len(reranked)} with scores: {[f'{s:.3f}' for s in scores[top_indices]]}")
             
             return reranked
             
@@ -259,10 +318,9 @@ class RAGChatService:
         """Re-rank documents using rule-based scoring (fallback method)"""
         # Extract keywords from query (simple approach: split and filter)
         query_lower = query.lower()
-        query_words = set(re.findall(r'\b\w+\b', query_lower))
+        query_words = set(WORD_RE.findall(query_lower))
         # Remove common stop words
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'should', 'could', 'may', 'might', 'can', 'this', 'that', 'these', 'those', 'what', 'which', 'who', 'whom', 'how', 'when', 'where', 'why'}
-        query_keywords = query_words - stop_words
+        query_keywords = query_words - STOP_WORDS
         
         scored_docs = []
         for doc in documents:
@@ -385,13 +443,10 @@ class RAGChatService:
         max_tokens = self.generation_config.get('max_output_tokens', 32768)
         logger.info(f"Generating response with Gemini model: {self.model_name} (max_output_tokens: {max_tokens}, prompt_length: {len(full_prompt)} chars)")
         try:
-            # Suppress stderr warnings during API call
-            with redirect_stderr(StringIO()):
-                # Explicitly pass generation config to ensure it's used
-                response = self.gemini_model.generate_content(
-                    full_prompt,
-                    generation_config=self.generation_config
-                )
+            # Runs in executor threads, so no redirect_stderr here: swapping sys.stderr is
+            # process-wide and not thread-safe. gRPC/absl logging is silenced via env at import.
+            # Generation config is bound to the model in _initialize_gemini
+            response = self.gemini_model.generate_content(full_prompt)
             if not response or not hasattr(response, 'text'):
                 raise ValueError("Invalid response from Gemini API")
             return response.text
@@ -399,6 +454,116 @@ class RAGChatService:
             logger.error(f"Gemini API call failed: {str(api_error)}")
             raise
     
+    def _response_cache_key(self, system_prompt: str, full_prompt: str) -> str:
+        """Build the response cache key for a prompt sent to the current provider and model"""
+        return hashlib.sha256(
+            f"{self.provider}\0{self.model_name}\0{system_prompt}\0{full_prompt}".encode('utf-8')
+        ).hexdigest()
+    
+    def _get_cached_response(self, cache_key: str) -> Optional[str]:
+        """Return a cached response and mark it as recently used"""
+        with self._response_cache_lock:
+            cached = self._response_cache.get(cache_key)
+            if cached is not None:
+                self._response_cache.move_to_end(cache_key)
+        if cached is not None:
+            logger.info("Response cache hit, skipping model call")
+        return cached
+    
+    def _cache_response(self, cache_key: str, response_text: str):
+        """Store a response, evicting the least recently used entry past the size limit"""
+        if self.response_cache_size <= 0:
+            return
+        with self._response_cache_lock:
+            self._response_cache[cache_key] = response_text
+            if len(self._response_cache) > self.response_cache_size:
+                self._response_cache.popitem(last=False)
+    
+    def _generate_cached(self, system_prompt: str, full_prompt: str) -> str:
+        """Generate a response, reusing a cached answer when the exact same prompt was already sent"""
+        cache_key = self._response_cache_key(system_prompt, full_prompt)
+        cached = self._get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+        
+        if self.provider == 'gemini':
+            response_text = self._generate_with_gemini(full_prompt)
+        else:
+            response_text = self._generate_with_lm_studio(system_prompt, full_prompt)
+        
+        self._cache_response(cache_key, response_text)
+        return response_text
+    
+    def _stream_with_lm_studio(self, system_prompt: str, full_prompt: str) -> Iterator[str]:
+        """Stream response chunks from LM Studio"""
+        if not self.client:
+            raise ValueError("LM Studio client not initialized")
+        
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": full_prompt}
+        ]
+        
+        logger.info(f"Streaming response with LM Studio model: {self.model_name}")
+        stream = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            stream=True,
+            **self.generation_config
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    def _stream_with_gemini(self, full_prompt: str) -> Iterator[str]:
+        """Stream response chunks from Gemini"""
+        if not self.gemini_model:
+            raise ValueError("Gemini model not initialized")
+        
+        logger.info(f"Streaming response with Gemini model: {self.model_name} (prompt_length: {len(full_prompt)} chars)")
+        # No redirect_stderr: this generator is advanced from executor threads
+        response = self.gemini_model.generate_content(full_prompt, stream=True)
+        for chunk in response:
+            text = getattr(chunk, 'text', None)
+            if text:
+                yield text
+    
+    def _stream_cached(self, system_prompt: str, full_prompt: str) -> Iterator[str]:
+        """Stream a response from the selected provider, caching the full text once complete"""
+        cache_key = self._response_cache_key(system_prompt, full_prompt)
+        cached = self._get_cached_response(cache_key)
+        if cached is not None:
+            yield cached
+            return
+        
+        if self.provider == 'gemini':
+            stream = self._stream_with_gemini(full_prompt)
+        else:
+            stream = self._stream_with_lm_studio(system_prompt, full_prompt)
+        
+        parts = []
+        for text in stream:
+            parts.append(text)
+            yield text
+        if not parts:
+            # Match the non-streaming path, which rejects empty responses, and never cache one
+            raise ValueError("Response content is None")
+        self._cache_response(cache_key, "".join(parts))
+    
+    @staticmethod
+    def _unique_sources(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Collapse retrieved chunks to one source entry per page, keeping rank order"""
+        seen = set()
+        sources = []
+        for doc in documents:
+            metadata = doc.get('metadata', {})
+            key = metadata.get('doc_id') or metadata.get('url')
+            if key in seen:
+                continue
+            seen.add(key)
+            sources.append(metadata)
+        return sources
+    
     async def generate_response(self, user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None, max_context_docs: int = 10) -> Dict[str, Any]:
         """
         Generate a response using RAG (Retrieval-Augmented Generation) with re-ranking
@@ -412,35 +577,23 @@ class RAGChatService:
             Dict containing the response and metadata
         """
         try:
-            # Step 1: Retrieve more documents initially for re-ranking
-            initial_limit = max_context_docs * 3  # Retrieve 3x more for better re-ranking
-            logger.info(f"Searching for relevant documents for query: {user_message} (retrieving {initial_limit} for re-ranking)")
-            retrieved_docs = await self.vector_store.search(user_message, limit=initial_limit)
-            
-            # Step 2: Re-rank documents to select the best context
-            relevant_docs = self._rerank_documents(retrieved_docs, user_message, top_k=max_context_docs)
-            
-            # Step 3: Prepare context from re-ranked documents
-            context = self._prepare_context(relevant_docs)
-            
-            # Step 3: Prepare conversation history
-            chat_history = self._prepare_chat_history(conversation_history)
-            
-            # Step 4: Create the prompt with context
-            system_prompt = self._create_system_prompt()
-            full_prompt = self._create_rag_prompt(user_message, context, chat_history)
+            # Steps 1-4: Retrieve, re-rank and build the prompt
+            relevant_docs, system_prompt, full_prompt = await self._build_prompts(
+                user_message, conversation_history, max_context_docs
+            )
             
-            # Step 5: Generate response using the selected provider
-            if self.provider == 'gemini':
-                response_text = self._generate_with_gemini(full_prompt)
-            else:
-                response_text = self._generate_with_lm_studio(system_prompt, full_prompt)
+            # Step 5: Generate response using the selected provider (or reuse a cached one).
+            # The provider SDKs are blocking, so run them off the event loop to let
+            # concurrent chat requests overlap their network round-trips.
+            loop = asyncio.get_event_loop()
+            response_text = await loop.run_in_executor(None, self._generate_cached, system_prompt, full_prompt)
             
             # Step 8: Format and return response
+            sources = self._unique_sources(relevant_docs)
             return {
                 'response': response_text,
-                'context_documents': len(relevant_docs),
-                'sources': [doc['metadata'] for doc in relevant_docs],
+                'context_documents': len(sources),
+                'sources': sources,
                 'relevant_docs': relevant_docs,
                 'success': True
             }
@@ -456,6 +609,59 @@ class RAGChatService:
                 'error': str(e)
             }
     
+    async def generate_response_stream(self, user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None, max_context_docs: int = 10) -> AsyncIterator[str]:
+        """
+        Generate a RAG response, yielding text chunks as the model produces them
+        
+        Args:
+            user_message: The user's message
+            conversation_history: Previous conversation messages
+            max_context_docs: Maximum number of relevant documents to use after re-ranking (default: 10)
+            
+        Yields:
+            Response text chunks
+        """
+        try:
+            relevant_docs, system_prompt, full_prompt = await self._build_prompts(
+                user_message, conversation_history, max_context_docs
+            )
+            
+            # Pull chunks from the blocking SDK iterator in a worker thread
+            loop = asyncio.get_event_loop()
+            stream = self._stream_cached(system_prompt, full_prompt)
+            done = object()
+            while True:
+                chunk = await loop.run_in_executor(None, next, stream, done)
+                if chunk is done:
+                    break
+                yield chunk
+        
+        except Exception as e:
+            logger.error(f"Failed to stream response: {str(e)}")
+            yield f"I apologize, but I encountered an error while processing your request: {str(e)}"
+    
+    async def _build_prompts(self, user_message: str, conversation_history: Optional[List[Dict[str, str]]], max_context_docs: int) -> Tuple[List[Dict[str, Any]], str, str]:
+        """Retrieve and re-rank documents, then build the system and RAG prompts"""
+        # Step 1: Retrieve more documents initially for re-ranking
+        initial_limit = max_context_docs * 3  # Retrieve 3x more for better re-ranking
+        logger.info(f"Searching for relevant documents for query: {user_message} (retrieving {initial_limit} for re-ranking)")
+        retrieved_docs = await self.vector_store.search(user_message, limit=initial_limit)
+        
+        # Step 2: Re-rank documents to select the best context
+        relevant_docs = self._rerank_documents(retrieved_docs, user_message, top_k=max_context_docs)
+        
+        # Step 3: Prepare context from re-ranked documents
+        context = self._prepare_context(relevant_docs)
+        
+        # Step 3: Prepare conversation history
+        chat_history = self._prepare_chat_history(conversation_history)
+        
+        # Step 4: Create the prompt with context
+        system_prompt = self._create_system_prompt()
+        full_prompt = self._create_rag_prompt(user_message, context, chat_history)
+        
+        return relevant_docs, system_prompt, full_prompt
+    
     def _prepare_context(self, relevant_docs: List[Dict[str, Any]]) -> str:
         """Prepare context string from relevant documents with rolling window"""
         if not relevant_docs:
@@ -575,30 +781,7 @@ Content: {truncated_content}
     
     def _create_system_prompt(self) -> str:
         """Create the system prompt with instructions for the AI assistant"""
-        return """You are a helpful AI assistant that answers questions based on the provided documentation context and conversation history. 
-
-Instructions:
-1. Answer the user's question using the information provided in the context and previous conversation
-2. Reference previous conversation when relevant to provide continuity and context
-3. If the context doesn't contain enough information to answer the question, say so clearly
-4. Be concise but comprehensive in your responses
-5. Cite specific documents or sections when relevant
-6. Maintain a helpful and professional tone
-7. If asked about something not in the context, politely explain that you can only answer based on the available documentation
-8. Build upon previous questions and answers to provide more detailed or related information when appropriate
-
-FORMATTING GUIDELINES:
-- Use proper markdown formatting for better readability
-- Use **bold** for important concepts and key terms
-- Use *italics* for emphasis
-- Use `code blocks` for code snippets, commands, and technical terms
-- Use ```language blocks for multi-line code examples
-- Use > blockquotes for important notes or warnings
-- Use bullet points (- or *) for lists
-- Use numbered lists (1., 2., 3.) for step-by-step instructions
-- Use ### for section headers when organizing complex information
-- Use tables when presenting structured data
-- Always format URLs as clickable links: [text](url)"""
+        return SYSTEM_PROMPT
     
     def _create_rag_prompt(self, user_message: str, context: str, chat_history: str) -> str:
         """Create the RAG prompt with context and conversation history"""
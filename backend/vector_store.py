@@ -2,17 +2,71 @@ import chromadb
 from chromadb.config import Settings
 from fastembed import TextEmbedding
 import logging
+import numpy as np
 import uuid
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import os
 from datetime import datetime
 import json
+import hashlib
+import re
 import shutil
+import sqlite3
+from crawler import compute_content_hash
 
 logger = logging.getLogger(__name__)
 
+# Try to import sqlite-vec for the optional local vector index
+try:
+    import sqlite_vec
+    SQLITE_VEC_AVAILABLE = True
+except ImportError:
+    SQLITE_VEC_AVAILABLE = False
+
+# Try to import orjson for faster document (de)serialization
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# Batches at least this large are sharded across worker processes (one per core)
+PARALLEL_EMBEDDING_MIN_TEXTS = 1000
+# WAL with relaxed syncing avoids an fsync per cache write; both SQLite files are rebuildable
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL;"
+    "PRAGMA synchronous=NORMAL;"
+    "PRAGMA temp_store=MEMORY;"
+    "PRAGMA cache_size=-65536;"
+    "PRAGMA mmap_size=268435456;"
+)
+
+def _write_json(path: str, data: Any):
+    """Write pretty-printed UTF-8 JSON, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+def _read_json(path: str) -> Any:
+    """Read a JSON file, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+@lru_cache(maxsize=4)
+def _get_embedding_model(model_name: str) -> TextEmbedding:
+    """Load an embedding model once per process and share it across VectorStore instances"""
+    return TextEmbedding(model_name=model_name, threads=os.cpu_count())
+
 class VectorStore:
     def __init__(self, collection_name: str = "talkdocs_collection", persist_directory: str = "./data/chroma_db"):
         self.collection_name = collection_name
@@ -23,10 +77,23 @@ class VectorStore:
         self.embedding_model = None
         self.executor = ThreadPoolExecutor(max_workers=2)
         self.current_source_id = None
+        self._source_dirs: set = set()  # Source document directories known to exist
+        self.use_sqlite_vec = os.getenv('USE_SQLITE_VEC', 'false').lower() == 'true'
+        self.vec_db = None
+        self.use_query_embedding_cache = os.getenv('USE_QUERY_EMBEDDING_CACHE', 'true').lower() == 'true'
+        self.embedding_cache_db = None
+        self.query_embedding_cache_size = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '10000'))
         
-        # Create directories if they don't exist
-        os.makedirs(self.persist_directory, exist_ok=True)
-        os.makedirs(self.documents_directory, exist_ok=True)
+        # Pages are split into overlapping chunks (~500 / ~50 tokens) before embedding
+        self.chunk_size = max(1, int(os.getenv('CHUNK_SIZE_CHARS', '2000')))
+        self.chunk_overlap = max(0, int(os.getenv('CHUNK_OVERLAP_CHARS', '200')))
+        if self.chunk_overlap >= self.chunk_size // 2:
+            # Overlap near the chunk size would advance only a few characters per chunk
+            logger.warning(
+                f"CHUNK_OVERLAP_CHARS ({self.chunk_overlap}) must be less than half of "
+                f"CHUNK_SIZE_CHARS ({self.chunk_size}); using {self.chunk_size // 4}"
+            )
+            self.chunk_overlap = self.chunk_size // 4
     
     def _generate_source_id(self, url: str) -> str:
         """Generate a unique source ID from URL"""
@@ -87,7 +154,7 @@ class VectorStore:
                     
                     # Get document count
                     try:
-                        doc_count = collection.count()
+                        doc_count = self._count_documents(collection)
                     except:
                         doc_count = 0
                     
@@ -108,6 +175,11 @@ class VectorStore:
     async def initialize(self):
         """Initialize ChromaDB client and collection"""
         try:
+            # Create directories if they don't exist (done here rather than in __init__
+            # so that importing a module which builds a VectorStore touches no files)
+            os.makedirs(self.persist_directory, exist_ok=True)
+            os.makedirs(self.documents_directory, exist_ok=True)
+            
             # Initialize ChromaDB client with persistent storage
             self.client = chromadb.PersistentClient(
                 path=self.persist_directory,
@@ -129,20 +201,207 @@ class VectorStore:
                 logger.info(f"Created new collection: {self.collection_name}")
             
             # Initialize lightweight embedding model (CPU-only, no torch)
-            self.embedding_model = TextEmbedding(model_name="sentence-transformers/all-MiniLM-L6-v2")
+            self.embedding_model = _get_embedding_model(EMBEDDING_MODEL_NAME)
+            self._initialize_sqlite_vec()
+            self._initialize_embedding_cache()
             logger.info("Vector store initialized successfully")
             
         except Exception as e:
             logger.error(f"Failed to initialize vector store: {str(e)}")
             raise
     
+    async def warmup(self):
+        """Run one throwaway embedding so the first real request skips ONNX session warm-up"""
+        try:
+            await self._get_embeddings(["warmup"])
+        except Exception as e:
+            logger.warning(f"Embedding model warm-up failed: {str(e)}")
+    
+    @staticmethod
+    def _connect_sqlite(path: str) -> sqlite3.Connection:
+        """Open a SQLite database shared across executor threads, tuned for cache workloads"""
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.executescript(SQLITE_PRAGMAS)
+        return conn
+    
+    def _initialize_sqlite_vec(self):
+        """Open the optional sqlite-vec index that mirrors Chroma with int8 vectors"""
+        if not self.use_sqlite_vec or self.vec_db is not None:
+            return
+        if not SQLITE_VEC_AVAILABLE:
+            logger.info("sqlite-vec not installed, using Chroma for all vector searches")
+            return
+        
+        try:
+            conn = self._connect_sqlite(os.path.join(self.persist_directory, "vec_index.db"))
+            conn.enable_load_extension(True)
+            sqlite_vec.load(conn)
+            conn.enable_load_extension(False)
+            self.vec_db = conn
+            logger.info("sqlite-vec index initialized")
+        except Exception as e:
+            logger.warning(f"Failed to load sqlite-vec extension: {str(e)}. Using Chroma for vector search.")
+            self.vec_db = None
+    
+    def _initialize_embedding_cache(self):
+        """Open the persistent SQLite cache of query embeddings"""
+        if not self.use_query_embedding_cache or self.embedding_cache_db is not None:
+            return
+        
+        try:
+            conn = self._connect_sqlite(os.path.join(self.persist_directory, "query_embeddings.db"))
+            # Embeddings are stored as float16 blobs
+            conn.execute("CREATE TABLE IF NOT EXISTS query_embeddings (hash TEXT PRIMARY KEY, vec BLOB)")
+            conn.commit()
+            self.embedding_cache_db = conn
+        except Exception as e:
+            logger.warning(f"Failed to open query embedding cache: {str(e)}")
+            self.embedding_cache_db = None
+    
+    async def _get_query_embedding(self, query: str) -> List[float]:
+        """Embed a search query, reusing embeddings cached across restarts"""
+        if not self.embedding_cache_db:
+            return (await self._get_embeddings([query]))[0]
+        
+        key = hashlib.sha256(f"{EMBEDDING_MODEL_NAME}\0{query}".encode('utf-8')).hexdigest()
+        try:
+            row = self.embedding_cache_db.execute(
+                "SELECT vec FROM query_embeddings WHERE hash = ?", (key,)
+            ).fetchone()
+            if row:
+                return np.frombuffer(row[0], dtype=np.float16).astype(np.float32).tolist()
+        except Exception as e:
+            logger.warning(f"Query embedding cache lookup failed: {str(e)}")
+        
+        embedding = (await self._get_embeddings([query]))[0]
+        try:
+            with self.embedding_cache_db:
+                self.embedding_cache_db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (hash, vec) VALUES (?, ?)",
+                    (key, np.asarray(embedding, dtype=np.float16).tobytes())
+                )
+                # Rowids grow with each insert, so this trims the oldest entries beyond the cap
+                self.embedding_cache_db.execute(
+                    "DELETE FROM query_embeddings WHERE rowid <= (SELECT MAX(rowid) FROM query_embeddings) - ?",
+                    (self.query_embedding_cache_size,)
+                )
+        except Exception as e:
+            logger.warning(f"Failed to cache query embedding: {str(e)}")
+        return embedding
+    
+    def _get_vec_table(self, source_id: str) -> str:
+        """Get the sqlite-vec table name for a specific source"""
+        return "vec_" + re.sub(r'\W', '_', source_id)
+    
+    @staticmethod
+    def _quantize_embedding(embedding: List[float]) -> bytes:
+        """Quantize an embedding to int8; cosine distance is unaffected by the per-vector scale"""
+        vec = np.asarray(embedding, dtype=np.float32)
+        scale = float(np.abs(vec).max()) or 1.0
+        return np.round(vec / scale * 127).astype(np.int8).tobytes()
+    
+    def _store_sqlite_vec(self, source_id: str, ids: List[str], embeddings: List[List[float]]):
+        """Mirror newly stored embeddings into the sqlite-vec index"""
+        if not self.vec_db:
+            return
+        
+        table = self._get_vec_table(source_id)
+        try:
+            exists = self.vec_db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (f"{table}_ids",)
+            ).fetchone()
+            if not exists:
+                # First mirror of this source: backfill everything already in Chroma,
+                # which includes the batch that was just added
+                stored = self.collection.get(include=['embeddings'])
+                ids, embeddings = stored['ids'], stored['embeddings']
+            if not len(ids):
+                return
+            
+            dimensions = len(embeddings[0])
+            with self.vec_db:
+                self.vec_db.execute(
+                    f'CREATE VIRTUAL TABLE IF NOT EXISTS "{table}" '
+                    f'USING vec0(embedding int8[{dimensions}] distance_metric=cosine)'
+                )
+                self.vec_db.execute(
+                    f'CREATE TABLE IF NOT EXISTS "{table}_ids" (rowid INTEGER PRIMARY KEY, doc_id TEXT UNIQUE)'
+                )
+                for doc_id, embedding in zip(ids, embeddings):
+                    rowid = self.vec_db.execute(
+                        f'INSERT INTO "{table}_ids" (doc_id) VALUES (?)', (doc_id,)
+                    ).lastrowid
+                    self.vec_db.execute(
+                        f'INSERT INTO "{table}" (rowid, embedding) VALUES (?, vec_int8(?))',
+                        (rowid, self._quantize_embedding(embedding))
+                    )
+        except Exception as e:
+            # A partial mirror would hide documents from search; drop it so Chroma is used
+            # and the next store rebuilds the mirror from the full collection
+            logger.warning(f"Failed to update sqlite-vec index for source {source_id}: {str(e)}")
+            self._drop_sqlite_vec(source_id)
+    
+    def _vector_search_sqlite(self, query_embedding: List[float], k: int) -> Optional[Dict[str, Any]]:
+        """KNN search against the sqlite-vec index, returning Chroma-shaped query results"""
+        if not self.vec_db or not self.current_source_id:
+            return None
+        
+        table = self._get_vec_table(self.current_source_id)
+        try:
+            # Only trust the mirror when it holds every chunk in Chroma (another process,
+            # e.g. the CLI without USE_SQLITE_VEC, may have added documents)
+            mirrored = self.vec_db.execute(f'SELECT COUNT(*) FROM "{table}_ids"').fetchone()[0]
+            if mirrored != self.collection.count():
+                return None
+            
+            rows = self.vec_db.execute(
+                f'SELECT i.doc_id, v.distance FROM "{table}" v JOIN "{table}_ids" i ON i.rowid = v.rowid '
+                f'WHERE v.embedding MATCH vec_int8(?) AND k = ? ORDER BY v.distance',
+                (self._quantize_embedding(query_embedding), k)
+            ).fetchall()
+        except sqlite3.OperationalError:
+            # Source has not been mirrored into sqlite-vec yet
+            return None
+        
+        if not rows:
+            return None
+        
+        doc_ids = [doc_id for doc_id, _ in rows]
+        stored = self.collection.get(ids=doc_ids, include=['documents', 'metadatas'])
+        by_id = {
+            doc_id: (doc, metadata)
+            for doc_id, doc, metadata in zip(stored['ids'], stored['documents'], stored['metadatas'])
+        }
+        hits = [(by_id[doc_id], distance) for doc_id, distance in rows if doc_id in by_id]
+        return {
+            'documents': [[doc for (doc, _), _ in hits]],
+            'metadatas': [[metadata for (_, metadata), _ in hits]],
+            # Chroma collections use squared L2, which is 2x cosine distance for normalized vectors
+            'distances': [[2 * distance for _, distance in hits]]
+        }
+    
+    def _drop_sqlite_vec(self, source_id: str):
+        """Remove a source from the sqlite-vec index"""
+        if not self.vec_db:
+            return
+        
+        table = self._get_vec_table(source_id)
+        try:
+            with self.vec_db:
+                self.vec_db.execute(f'DROP TABLE IF EXISTS "{table}"')
+                self.vec_db.execute(f'DROP TABLE IF EXISTS "{table}_ids"')
+        except Exception as e:
+            logger.warning(f"Failed to drop sqlite-vec index for source {source_id}: {str(e)}")
+    
     async def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for texts using fastembed"""
         try:
             # fastembed returns a generator of numpy arrays
             loop = asyncio.get_event_loop()
             def _embed_batch(input_texts):
-                return list(self.embedding_model.embed(input_texts))
+                # Small batches stay in-process to avoid worker startup and model load costs
+                parallel = 0 if len(input_texts) >= PARALLEL_EMBEDDING_MIN_TEXTS else None
+                return list(self.embedding_model.embed(input_texts, parallel=parallel))
             embeddings = await loop.run_in_executor(self.executor, _embed_batch, texts)
             # Ensure plain python lists for Chroma
             return [emb.tolist() for emb in embeddings]
@@ -150,8 +409,54 @@ class VectorStore:
             logger.error(f"Failed to generate embeddings: {str(e)}")
             raise
     
-    async def store_documents(self, pages: List[Dict[str, Any]], source_url: str = None):
-        """Store documents in the vector database and save raw documents locally"""
+    def _get_stored_content_hashes(self, content_hashes: List[str]) -> set:
+        """Return which of the given content hashes are already stored in the active collection"""
+        if not content_hashes:
+            return set()
+        try:
+            existing = self.collection.get(
+                where={'content_hash': {'$in': list(set(content_hashes))}},
+                include=['metadatas']
+            )
+            return {metadata['content_hash'] for metadata in existing['metadatas'] if metadata}
+        except Exception as e:
+            logger.warning(f"Failed to look up existing content hashes: {str(e)}")
+            return set()
+    
+    @staticmethod
+    def _count_documents(collection) -> int:
+        """Count stored pages in a collection; each page may span several chunks"""
+        # Every chunked page has exactly one chunk_index 0; fetch ids only, no metadata
+        first_chunks = collection.get(where={'chunk_index': 0}, include=[])['ids']
+        # Collections stored before chunking have no chunk_index, one entry per page
+        return len(first_chunks) or collection.count()
+    
+    def _split_into_chunks(self, content: str) -> List[str]:
+        """Split content into overlapping chunks, preferring to break on whitespace"""
+        if len(content) <= self.chunk_size:
+            return [content]
+        
+        chunks = []
+        start = 0
+        while start < len(content):
+            end = min(start + self.chunk_size, len(content))
+            if end < len(content):
+                # Back up to the last space so words are not cut in half
+                space = content.rfind(' ', start + self.chunk_overlap + 1, end)
+                if space != -1:
+                    end = space
+            chunks.append(content[start:end].strip())
+            if end >= len(content):
+                break
+            # Start the next chunk on a word boundary inside the overlap window
+            next_start = max(end - self.chunk_overlap, start + 1)
+            space = content.find(' ', next_start, end)
+            start = space + 1 if space != -1 else next_start
+        return [chunk for chunk in chunks if chunk]
+    
+    async def store_documents(self, pages: List[Dict[str, Any]], source_url: str = None) -> List[Dict[str, Any]]:
+        """Store documents in the vector database and save raw documents locally.
+        Returns the pages actually stored; empty and duplicate pages are skipped."""
         try:
             # Generate source ID from the first page URL or provided source_url
             if source_url:
@@ -168,13 +473,25 @@ class VectorStore:
             metadatas = []
             ids = []
             stored_docs = []
+            stored_pages = []
+            pending_saves = []
             
-            for page in pages:
+            # Skip pages whose content is already stored (mirror URLs, pagination, re-crawls)
+            content_hashes = [compute_content_hash(page.get('content', '')) for page in pages]
+            seen_hashes = self._get_stored_content_hashes(content_hashes)
+            duplicate_count = 0
+            
+            for page, content_hash in zip(pages, content_hashes):
                 # Prepare document content
                 content = page.get('content', '')
                 if not content.strip():
                     continue
                 
+                if content_hash in seen_hashes:
+                    duplicate_count += 1
+                    continue
+                seen_hashes.add(content_hash)
+                
                 # Create document ID
                 doc_id = str(uuid.uuid4())
                 
@@ -185,18 +502,23 @@ class VectorStore:
                     'meta_description': page.get('meta_description', ''),
                     'timestamp': page.get('timestamp', 0),
                     'content_length': len(content),
+                    'content_hash': content_hash,
                     'doc_id': doc_id,
                     'crawled_at': datetime.now().isoformat(),
                     'source_id': source_id,
                     'source_url': source_url or pages[0].get('url', '')
                 }
                 
-                # Save raw document to local storage with source organization
-                await self._save_document_locally(doc_id, page, metadata, source_id)
+                # Raw document is saved locally once the chunks are in Chroma
+                pending_saves.append((doc_id, page, metadata))
                 
-                documents.append(content)
-                metadatas.append(metadata)
-                ids.append(doc_id)
+                # Index the page as chunks so retrieval returns focused passages
+                chunks = self._split_into_chunks(content)
+                for chunk_index, chunk in enumerate(chunks):
+                    documents.append(chunk)
+                    metadatas.append({**metadata, 'chunk_index': chunk_index, 'chunk_count': len(chunks)})
+                    ids.append(doc_id if len(chunks) == 1 else f"{doc_id}_{chunk_index}")
+                stored_pages.append(page)
                 stored_docs.append({
                     'id': doc_id,
                     'url': page.get('url', ''),
@@ -205,12 +527,15 @@ class VectorStore:
                     'source_id': source_id
                 })
             
+            if duplicate_count:
+                logger.info(f"Skipped {duplicate_count} duplicate documents in source {source_id}")
+            
             if not documents:
                 logger.warning("No valid documents to store")
-                return
+                return []
             
             # Generate embeddings
-            logger.info(f"Generating embeddings for {len(documents)} documents in source {source_id}...")
+            logger.info(f"Generating embeddings for {len(documents)} chunks from {len(stored_docs)} documents in source {source_id}...")
             embeddings = await self._get_embeddings(documents)
             
             # Store in ChromaDB
@@ -220,11 +545,21 @@ class VectorStore:
                 ids=ids,
                 embeddings=embeddings
             )
+            self._store_sqlite_vec(source_id, ids, embeddings)
+            
+            # Save raw documents to local storage with source organization. Written only after
+            # the Chroma add so a failed batch leaves no orphaned files; files are independent,
+            # so write them concurrently
+            await asyncio.gather(*(
+                self._save_document_locally(doc_id, page, metadata, source_id)
+                for doc_id, page, metadata in pending_saves
+            ))
             
             # Update document index with source information
             await self._update_document_index(stored_docs, source_id)
             
-            logger.info(f"Successfully stored {len(documents)} documents in source {source_id}")
+            logger.info(f"Successfully stored {len(stored_docs)} documents ({len(documents)} chunks) in source {source_id}")
+            return stored_pages
             
         except Exception as e:
             logger.error(f"Failed to store documents: {str(e)}")
@@ -262,30 +597,36 @@ class VectorStore:
                 logger.warning("No active collection for search")
                 return []
             
-            # Generate query embedding
-            query_embedding = await self._get_embeddings([query])
+            # Generate query embedding (cached across restarts)
+            query_embedding = [await self._get_query_embedding(query)]
             
-            # Search in ChromaDB
-            results = self.collection.query(
-                query_embeddings=query_embedding,
-                n_results=limit,
-                include=['documents', 'metadatas', 'distances']
-            )
+            # Search the sqlite-vec index when available, falling back to ChromaDB
+            results = self._vector_search_sqlite(query_embedding[0], limit)
+            if results is None:
+                results = self.collection.query(
+                    query_embeddings=query_embedding,
+                    n_results=limit,
+                    include=['documents', 'metadatas', 'distances']
+                )
             
             # Format results
             formatted_results = []
             if results['documents'] and results['documents'][0]:
-                for i, (doc, metadata, distance) in enumerate(zip(
-                    results['documents'][0],
-                    results['metadatas'][0],
-                    results['distances'][0]
-                )):
-                    formatted_results.append({
+                # Convert distances to similarities in a single vectorized op
+                similarities = (1.0 - np.asarray(results['distances'][0])).tolist()
+                formatted_results = [
+                    {
                         'content': doc,
                         'metadata': metadata,
-                        'similarity_score': 1 - distance,  # Convert distance to similarity
+                        'similarity_score': similarity,
                         'rank': i + 1
-                    })
+                    }
+                    for i, (doc, metadata, similarity) in enumerate(zip(
+                        results['documents'][0],
+                        results['metadatas'][0],
+                        similarities
+                    ))
+                ]
             
             logger.info(f"Found {len(formatted_results)} results for query '{query}' in source {self.current_source_id}")
             return formatted_results
@@ -321,10 +662,25 @@ class VectorStore:
             except Exception:
                 pass  # Collection might not exist
             
+            # Drop the sqlite-vec mirror for every source
+            if self.vec_db:
+                for collection in collections:
+                    if collection.name.startswith(self.collection_name + "_"):
+                        self._drop_sqlite_vec(collection.name[len(self.collection_name) + 1:])
+            
+            # Forget cached query embeddings
+            if self.embedding_cache_db:
+                try:
+                    with self.embedding_cache_db:
+                        self.embedding_cache_db.execute("DELETE FROM query_embeddings")
+                except Exception as e:
+                    logger.warning(f"Failed to clear query embedding cache: {str(e)}")
+            
             # Clear local document files
             if os.path.exists(self.documents_directory):
                 try:
                     shutil.rmtree(self.documents_directory)
+                    self._source_dirs.clear()
                     os.makedirs(self.documents_directory, exist_ok=True)
                     logger.info("Cleared local document files")
                 except Exception as e:
@@ -352,7 +708,7 @@ class VectorStore:
             await self.initialize()
         
         try:
-            count = self.collection.count()
+            count = self._count_documents(self.collection)
             return {
                 'total_documents': count,
                 'collection_name': self.collection_name
@@ -377,12 +733,23 @@ class VectorStore:
             
             # Create source-specific directory
             source_dir = os.path.join(self.documents_directory, source_id)
-            os.makedirs(source_dir, exist_ok=True)
-            
-            # Save individual document file in source directory
             doc_file_path = os.path.join(source_dir, f"{doc_id}.json")
-            with open(doc_file_path, 'w', encoding='utf-8') as f:
-                json.dump(document_data, f, indent=2, ensure_ascii=False)
+            
+            def _write_document():
+                if source_dir not in self._source_dirs:
+                    os.makedirs(source_dir, exist_ok=True)
+                    self._source_dirs.add(source_dir)
+                try:
+                    _write_json(doc_file_path, document_data)
+                except FileNotFoundError:
+                    # Another process (e.g. the CLI clearing a source) removed the directory
+                    os.makedirs(source_dir, exist_ok=True)
+                    _write_json(doc_file_path, document_data)
+            
+            # Save individual document file in source directory on the default executor,
+            # keeping the two embedding workers free for batches
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, _write_document)
             
             logger.debug(f"Saved document {doc_id} to {doc_file_path}")
             
@@ -397,8 +764,7 @@ class VectorStore:
             
             # Load existing index or create new one
             if os.path.exists(index_file):
-                with open(index_file, 'r', encoding='utf-8') as f:
-                    index_data = json.load(f)
+                index_data = _read_json(index_file)
             else:
                 index_data = {
                     'source_id': source_id,
@@ -413,8 +779,7 @@ class VectorStore:
             index_data['total_documents'] = len(index_data['documents'])
             
             # Save updated index
-            with open(index_file, 'w', encoding='utf-8') as f:
-                json.dump(index_data, f, indent=2, ensure_ascii=False)
+            _write_json(index_file, index_data)
             
             logger.info(f"Updated document index for source {source_id} with {len(stored_docs)} new documents")
             
@@ -429,8 +794,7 @@ class VectorStore:
             if not os.path.exists(doc_file_path):
                 raise FileNotFoundError(f"Document {doc_id} not found")
             
-            with open(doc_file_path, 'r', encoding='utf-8') as f:
-                document_data = json.load(f)
+            document_data = _read_json(doc_file_path)
             
             return document_data
             
@@ -451,10 +815,7 @@ class VectorStore:
                     'documents': []
                 }
             
-            with open(index_file, 'r', encoding='utf-8') as f:
-                index_data = json.load(f)
-            
-            return index_data
+            return _read_json(index_file)
             
         except Exception as e:
             logger.error(f"Failed to get documents metadata: {str(e)}")
@@ -567,8 +928,11 @@ class VectorStore:
             except Exception as e:
                 logger.warning(f"Failed to delete collection {collection_name}: {str(e)}")
             
+            self._drop_sqlite_vec(source_id)
+            
             # Remove stored documents directory
             source_dir = os.path.join(self.documents_directory, source_id)
+            self._source_dirs.discard(source_dir)
             if os.path.exists(source_dir):
                 shutil.rmtree(source_dir, ignore_errors=True)
                 logger.info(f"Removed documents directory for source {source_id}")